@@ -1,4 +1,5 @@
 import os
+import time
 import threading
 import logging
 from typing import Optional, Dict, Any, List
@@ -9,6 +10,35 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+import shared_cache  # reads SHARED_CACHE_PATH, so after load_dotenv
+import ticks  # reads TICK_RECORD_PATH / TICK_REPLAY_PATH
+from indicators import parse_specs, compute as compute_indicators
+from profiling import span
+
+# TTLs for the optional cross-process cache tier (see shared_cache.py)
+_SESSION_KEY = "angel:session"
+SESSION_TTL = float(os.getenv("ANGEL_SESSION_TTL", 6 * 3600))
+SCRIP_TTL = float(os.getenv("ANGEL_SCRIP_TTL", 24 * 3600))
+LTP_TTL = float(os.getenv("ANGEL_LTP_TTL", 2))
+SCRIP_RATE = float(os.getenv("ANGEL_SCRIP_RATE", 3))  # searchScrip calls per second
+
+class RateLimiter:
+    """Spaces calls at most `rate` per second across all threads of the process."""
+    def __init__(self, rate: float) -> None:
+        self._interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self._interval
+        if at > now:
+            time.sleep(at - now)
+
+_scrip_limiter = RateLimiter(SCRIP_RATE)
+
 class AngelClient:
     def __init__(self) -> None:
         self._lock = threading.Lock()
@@ -59,7 +89,29 @@ class AngelClient:
             "X-MACAddress":     self._mac_addr,
         }
 
-    def _login(self) -> SmartConnect:
+    def _adopt_session(self, session: Dict[str, Any]) -> SmartConnect:
+        sc = SmartConnect(api_key=self._need("ANGEL_ONE_API_KEY"))
+        try:
+            if session.get("access"):
+                sc.setAccessToken(session["access"])
+            elif session.get("jwt"):
+                sc.setAccessToken(session["jwt"])
+        except Exception:
+            pass
+        if session.get("feedToken"):
+            sc.setFeedToken(session["feedToken"])
+        self._client  = sc
+        self._session = dict(session)
+        self.log.info("SmartAPI session adopted from shared cache")
+        return sc
+
+    def _login(self, stale_bearer: Optional[str] = None) -> SmartConnect:
+        # Another worker may already hold a session; reuse it unless it is the
+        # one that was just rejected.
+        shared = shared_cache.get_json(_SESSION_KEY)
+        if shared and shared.get("bearer") and shared.get("bearer") != stale_bearer:
+            return self._adopt_session(shared)
+
         api_key     = self._need("ANGEL_ONE_API_KEY")
         client_code = self._need("ANGEL_ONE_CLIENT_CODE")
         password    = self._need("ANGEL_ONE_PASSWORD")
@@ -69,7 +121,8 @@ class AngelClient:
         sc = SmartConnect(api_key=api_key)
 
         try:
-            resp = sc.generateSession(client_code, password, totp_now)
+            with span("smartapi.generateSession"):
+                resp = sc.generateSession(client_code, password, totp_now)
         except Exception as e:
             self.log.error(f"SmartAPI generateSession crashed: {e}")
             raise RuntimeError(f"SmartAPI generateSession crashed: {e}") from e
@@ -114,6 +167,7 @@ class AngelClient:
             "feedToken": feed,
         }
         self.log.info("SmartAPI session established (jwt=%s, access=%s, feed=%s)", bool(jwt), bool(access), bool(feed))
+        shared_cache.set_json(_SESSION_KEY, self._session, SESSION_TTL)
         return sc
 
     def _ensure_auth(self, sc: SmartConnect) -> None:
@@ -153,25 +207,52 @@ class AngelClient:
 
     def force_login(self) -> Dict[str, Any]:
         with self._lock:
-            self._login()
+            self._login(stale_bearer=self._session.get("bearer") if self._session else None)
             return {"ok": True, "feedToken": self._session.get("feedToken") if self._session else None}
 
     def logout(self) -> Dict[str, Any]:
         with self._lock:
             self._client = None
             self._session = None
+            shared_cache.delete(_SESSION_KEY)
             return {"ok": True}
 
     def search_scrip(self, exchange: str, query: str) -> List[Dict[str, Any]]:
-        URL = "https://apiconnect.angelbroking.com/rest/secure/angelbroking/order/v1/searchScrip"
         ex = (exchange or "").upper()
+        cache_key = f"scrip:{ex}:{(query or '').upper()}"
+        hit = shared_cache.get_json(cache_key)
+        if hit is not None:
+            return hit
+        if ticks.REPLAY_PATH:
+            data = ticks.replay_scrip(ex, query or "")
+        else:
+            _scrip_limiter.wait()
+            data = self._search_scrip(ex, query)
+            ticks.record_scrip(ex, query or "", data)
+        if data:
+            shared_cache.set_json(cache_key, data, SCRIP_TTL)
+        return data
+
+    def resolve_scrip(self, exchange: str, tradingsymbol: str) -> tuple[str, str]:
+        """Pick the instrument an order for `tradingsymbol` goes to (prefer the
+        -EQ series); return (tradingsymbol, symboltoken)."""
+        hits = self.search_scrip(exchange, tradingsymbol or "")
+        hits = [h for h in hits if str(h.get("tradingsymbol", "")).endswith("-EQ")] or hits
+        if not hits:
+            raise RuntimeError(f"No scrip found for {tradingsymbol or '(empty)'} on {exchange}")
+        top = hits[0]
+        return str(top.get("tradingsymbol") or tradingsymbol), str(top.get("symboltoken") or top.get("token"))
+
+    def _search_scrip(self, ex: str, query: str) -> List[Dict[str, Any]]:
+        URL = "https://apiconnect.angelbroking.com/rest/secure/angelbroking/order/v1/searchScrip"
         payload = {"exchange": ex, "searchscrip": query}
 
         def _post(tkn: str) -> Dict[str, Any]:
             hdrs = self._headers(tkn)
             masked = {**hdrs, "Authorization": "Bearer ***"}
             self.log.info("search_scrip POST %s %s headers=%s", ex, query, masked)
-            r = requests.post(URL, headers=hdrs, json=payload, timeout=20)
+            with span("smartapi.searchScrip"):
+                r = requests.post(URL, headers=hdrs, json=payload, timeout=20)
             ctype = r.headers.get("content-type", "")
             if "application/json" not in ctype:
                 snippet = (r.text or "")[:200].replace("\n", " ")
@@ -218,10 +299,21 @@ class AngelClient:
         tsym = (tradingsymbol or "").upper().strip()
         tok  = str(token).strip()
 
+        cache_key = f"ltp:{ex}:{tok}"
+        hit = shared_cache.get_json(cache_key)
+        if hit is not None:
+            return hit
+
+        if ticks.REPLAY_PATH:
+            resp = ticks.replay_quote(ex, tsym, tok)
+            shared_cache.set_json(cache_key, resp, LTP_TTL)
+            return resp
+
         def _do(sc): 
             return sc.ltpData(ex, tsym, tok)
 
-        resp = self._retry_if_invalid_token(_do)
+        with span("smartapi.ltpData"):
+            resp = self._retry_if_invalid_token(_do)
 
         if not isinstance(resp, dict):
             self._log_error("ltp", f"unexpected response {resp!r}")
@@ -233,23 +325,38 @@ class AngelClient:
             self._log_error("ltp", msg, code)
             raise RuntimeError(self._format_error(msg, code))
 
+        ticks.record_quote(ex, tok, resp)
+        shared_cache.set_json(cache_key, resp, LTP_TTL)
         return resp
     
-    def candles(self, exchange: str, token: str, interval: str, from_dt: str, to_dt: str) -> Dict[str, Any]:
+    def candles(self, exchange: str, token: str, interval: str, from_dt: str, to_dt: str,
+                indicators: Optional[Any] = None) -> Dict[str, Any]:
+        specs = parse_specs(indicators)  # validate before hitting the API
         params = {"exchange": exchange, "symboltoken": token, "interval": interval,
                   "fromdate": from_dt, "todate": to_dt}
-        def _do(sc): return sc.getCandleData(params)
-        resp = self._retry_if_invalid_token(_do)
-        if not isinstance(resp, dict):
-            self._log_error("candles", f"unexpected response {resp!r}")
-            raise RuntimeError(f"candles: unexpected response {resp!r}")
-        if resp.get("status") is False or resp.get("success") is False:
-            msg  = resp.get("message") or resp.get("statusMessage") or "Unknown error"
-            code = resp.get("errorCode") or resp.get("errorcode") or resp.get("code")
-            self._log_error("candles", msg, code)
-            raise RuntimeError(self._format_error(msg, code))
+        if ticks.REPLAY_PATH:
+            resp = ticks.replay_candles(exchange, str(token), interval, from_dt, to_dt)
+        else:
+            def _do(sc): return sc.getCandleData(params)
+            with span("smartapi.getCandleData"):
+                resp = self._retry_if_invalid_token(_do)
+            if not isinstance(resp, dict):
+                self._log_error("candles", f"unexpected response {resp!r}")
+                raise RuntimeError(f"candles: unexpected response {resp!r}")
+            if resp.get("status") is False or resp.get("success") is False:
+                msg  = resp.get("message") or resp.get("statusMessage") or "Unknown error"
+                code = resp.get("errorCode") or resp.get("errorcode") or resp.get("code")
+                self._log_error("candles", msg, code)
+                raise RuntimeError(self._format_error(msg, code))
+            ticks.record_candles(exchange, str(token), interval, from_dt, to_dt, resp)
+        if specs:
+            with span("indicators"):
+                resp["indicators"] = compute_indicators(resp.get("data") or [], specs, (exchange, str(token), interval))
         return resp
 
     def place_order_live(self, params: Dict[str, Any]) -> Any:
+        if ticks.REPLAY_PATH:
+            raise RuntimeError("LIVE orders are disabled while replaying recorded ticks")
         sc = self.get_client()
-        return sc.placeOrder(params)
\ No newline at end of file
+        with span("smartapi.placeOrder"):
+            return sc.placeOrder(params)
\ No newline at end of file
@@ -0,0 +1,187 @@
+import json
+import struct
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+# Compact encodings for SmartAPI candle rows ([ts, o, h, l, c, v]).
+#
+# "columnar": JSON with one array per field, timestamps as t0 (epoch
+#   seconds) + per-bar deltas and prices as integers in 1/scale units; far
+#   less text than nested rows and no float repr on the hot path.
+#
+# scale is picked per payload: the smallest of PRICE_SCALES that represents
+# every price exactly in int32 (100 for paise ticks, 10000 for CDS's four
+# decimals). If none does, prices stay float64 (plain numbers in columnar
+# JSON) with scale 1, so dividing by scale is always correct.
+#
+# "binary" (application/x-candles), all little-endian:
+#   b"CNDL" | u32 meta_len | meta JSON | column buffers
+#   meta = {"v": 1, "n", "t0", "tz", "scale", "columns": [{"name", "dtype", "offset"}]}
+#   Every buffer starts on an 8-byte boundary (offset is from the start of the
+#   payload), so a browser can map each one as a typed array without copying.
+#   Prices are int32 in 1/scale units (float64 when scale is 1), dt is int32 seconds since the previous
+#   bar (0 for the first), volume is int64, indicators are float64 (NaN = none).
+
+FORMATS = ("json", "columnar", "binary")
+MEDIA_TYPES = {
+    "application/x-candles": "binary",
+    "application/vnd.candles+json": "columnar",
+}
+BINARY_MEDIA_TYPE = "application/x-candles"
+PRICE_SCALES = (100, 10_000)
+_MAGIC = b"CNDL"
+_PRICES = ("open", "high", "low", "close")
+
+def negotiate(fmt: Optional[str], accept: Optional[str] = None) -> str:
+    """Pick an encoding from an explicit format, else the Accept header; default json."""
+    if fmt:
+        f = fmt.strip().lower()
+        if f not in FORMATS:
+            raise ValueError(f"Unknown candle format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+        return f
+    for part in (accept or "").split(","):
+        f = MEDIA_TYPES.get(part.split(";")[0].strip().lower())
+        if f:
+            return f
+    return "json"
+
+def _epoch(stamps: List[str]) -> np.ndarray:
+    # SmartAPI stamps share one offset ("2025-09-13T09:15:00+05:30"), so parse
+    # the local part in one vectorized call and shift by that offset.
+    first = datetime.fromisoformat(stamps[0])
+    off = first.utcoffset()
+    if off is not None and len({s[19:] for s in stamps}) == 1:
+        local = np.array([s[:19] for s in stamps], dtype="datetime64[s]").astype(np.int64)
+        return local - int(off.total_seconds())
+    return np.array([int(datetime.fromisoformat(s).timestamp()) for s in stamps], dtype=np.int64)
+
+def _columns(rows: Sequence[Sequence[Any]]) -> Dict[str, Any]:
+    # Transpose once with zip and build one array per column: about half the
+    # cost of np.asarray over per-row slices
+    if rows:
+        ts, *fields = zip(*rows)  # SmartAPI rows are exactly [ts, o, h, l, c, v]
+        stamps = list(map(str, ts))
+        prices = np.array(fields[:4], dtype=float)  # 4 x n
+        volume = np.array(fields[4], dtype=float)
+        epoch = _epoch(stamps)
+    else:
+        stamps, prices, volume = [], np.zeros((4, 0)), np.zeros(0)
+        epoch = np.zeros(0, dtype=np.int64)
+    cols: Dict[str, Any] = {
+        "t0": int(epoch[0]) if len(epoch) else 0,
+        "dt": np.diff(epoch, prepend=epoch[:1]).astype("<i4"),
+        "tz": stamps[0][19:] if stamps else "",
+        "volume": volume.astype("<i8"),
+    }
+    scale = price_scale(prices)
+    cols["scale"] = scale
+    for i, k in enumerate(_PRICES):
+        cols[k] = np.rint(prices[i] * scale).astype("<i4") if scale > 1 else prices[i].astype("<f8")
+    return cols
+
+def price_scale(prices: np.ndarray) -> int:
+    """Smallest of PRICE_SCALES that stores `prices` exactly as int32, else 1."""
+    for scale in PRICE_SCALES:
+        scaled = prices * scale
+        ints = np.rint(scaled)
+        if np.all(np.abs(scaled - ints) < 1e-6 * scale) and np.all(np.abs(ints) < 2**31):
+            return scale
+    return 1
+
+def to_columnar(resp: Dict[str, Any]) -> Dict[str, Any]:
+    rows = resp.get("data") or []
+    cols = _columns(rows)
+    out: Dict[str, Any] = {
+        "status": resp.get("status"),
+        "message": resp.get("message"),
+        "errorcode": resp.get("errorcode"),
+        "format": "columnar",
+        "n": len(rows),
+        "t0": cols["t0"],
+        "tz": cols["tz"],
+        "scale": cols["scale"],
+        "dt": cols["dt"].tolist(),
+        **{k: cols[k].tolist() for k in (*_PRICES, "volume")},
+    }
+    if "indicators" in resp:
+        out["indicators"] = resp["indicators"]
+    return out
+
+def to_binary(resp: Dict[str, Any]) -> bytes:
+    rows = resp.get("data") or []
+    cols = _columns(rows)
+    buffers: List[tuple[str, np.ndarray]] = [("dt", cols["dt"])]
+    buffers += [(k, cols[k]) for k in (*_PRICES, "volume")]
+    for name, values in (resp.get("indicators") or {}).items():
+        buffers.append((name, np.array(values, dtype="<f8")))  # None -> NaN
+
+    def _meta(offsets: List[int]) -> bytes:
+        return json.dumps({
+            "v": 1, "n": len(rows), "t0": cols["t0"], "tz": cols["tz"], "scale": cols["scale"],
+            "columns": [
+                {"name": name, "dtype": buf.dtype.name, "offset": off}
+                for (name, buf), off in zip(buffers, offsets)
+            ],
+        }, separators=(",", ":")).encode("utf-8")
+
+    # Offsets depend on the meta length, which depends on the offsets' digits;
+    # lay out once with placeholders, then again until the layout is stable.
+    offsets = [0] * len(buffers)
+    while True:
+        pos = _align(len(_MAGIC) + 4 + len(_meta(offsets)))
+        new = []
+        for _, buf in buffers:
+            new.append(pos)
+            pos = _align(pos + buf.nbytes)
+        if new == offsets:
+            break
+        offsets = new
+
+    meta = _meta(offsets)
+    out = bytearray(pos)
+    struct.pack_into("<4sI", out, 0, _MAGIC, len(meta))
+    out[8:8 + len(meta)] = meta
+    for (_, buf), off in zip(buffers, offsets):
+        out[off:off + buf.nbytes] = buf.tobytes()
+    return bytes(out)
+
+def from_binary(buf: Any) -> Dict[str, Any]:
+    """Inverse of to_binary: rebuild a SmartAPI-shaped response from a payload
+    (bytes or a memoryview/mmap slice; column reads do not copy)."""
+    magic, meta_len = struct.unpack_from("<4sI", buf, 0)
+    if magic != _MAGIC:
+        raise ValueError("not a candle payload")
+    meta = json.loads(bytes(buf[8:8 + meta_len]))
+    n = meta["n"]
+    cols = {c["name"]: np.frombuffer(buf, dtype=np.dtype(c["dtype"]).newbyteorder("<"), count=n, offset=c["offset"])
+            for c in meta["columns"]}
+    tz = meta["tz"]
+    off = _offset_seconds(tz)
+    local = (meta["t0"] + np.cumsum(cols["dt"], dtype=np.int64) + off).astype("datetime64[s]")
+    stamps = [f"{s}{tz or '+00:00'}" for s in local.astype(str)]
+    scale = meta["scale"]
+    prices = [cols[k] / scale for k in _PRICES]
+    rows = [[t, *(float(p[i]) for p in prices), int(cols["volume"][i])] for i, t in enumerate(stamps)]
+    out: Dict[str, Any] = {"status": True, "message": "SUCCESS", "errorcode": "", "data": rows}
+    extra = [c["name"] for c in meta["columns"] if c["name"] not in ("dt", *_PRICES, "volume")]
+    if extra:
+        out["indicators"] = {k: [None if np.isnan(v) else float(v) for v in cols[k]] for k in extra}
+    return out
+
+def _offset_seconds(tz: str) -> int:
+    # "+05:30" -> 19800; anything else (empty, "Z") is treated as UTC
+    if len(tz) == 6 and tz[0] in "+-" and tz[3] == ":":
+        secs = int(tz[1:3]) * 3600 + int(tz[4:6]) * 60
+        return secs if tz[0] == "+" else -secs
+    return 0
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+def encode(resp: Dict[str, Any], fmt: str) -> Any:
+    if fmt == "columnar":
+        return to_columnar(resp)
+    if fmt == "binary":
+        return to_binary(resp)
+    return resp
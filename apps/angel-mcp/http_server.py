@@ -1,11 +1,16 @@
 import sys
 import os
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+import json
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
+import candle_codec
+from profiling import ProfileMiddleware, profiled
+import screener
 
-from tools_shared import ping, Yo, angel_login_status, angel_login, angel_logout, angel_search_scrip, angel_ltp, angel_candles, angel_mode, angel_set_mode, place_order, list_orders, list_positions
+from tools_shared import ping, Yo, angel_login_status, angel_login, angel_logout, angel_search_scrip, angel_ltp, angel_candles, angel_mode, angel_set_mode, place_order, place_orders, screen, screen_iter, list_orders, list_positions
 
 http_app = FastAPI(title="angel-mcp-http")
 
@@ -21,6 +26,8 @@ TOOL_MAP = {
     "mode": angel_mode,
     "set_mode": angel_set_mode,
     "place_order": place_order,
+    "place_orders": place_orders,
+    "screen": screen,
     "list_orders": list_orders,
     "list_positions": list_positions,
 }
@@ -34,7 +41,12 @@ http_app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request profiling (see profiling.py): inactive without PROFILE_DIR; callers opt in
+# with the PROFILE_TOKEN secret, otherwise only PROFILE_SAMPLE_RATE applies
+http_app.add_middleware(ProfileMiddleware)
+
 # Helper to find symboltoken for a given exchange and tradingsymbol
+@profiled("get_symboltoken")
 def get_symboltoken(exchange, tradingsymbol):
     scrips = TOOL_MAP["search_scrip"](exchange, tradingsymbol)
     symboltoken = None
@@ -77,6 +89,33 @@ async def place_order_endpoint(request: Request):
     symboltoken = get_symboltoken(exchange, tradingsymbol)
     return JSONResponse(TOOL_MAP["place_order"](exchange, tradingsymbol, transactiontype, quantity, ordertype, price, symboltoken))
 
+@http_app.post("/place_orders")
+async def place_orders_endpoint(request: Request):
+    body = await request.json()
+    orders = body.get("orders") if isinstance(body, dict) else body
+    if not isinstance(orders, list):
+        return JSONResponse({"error": "Body must be a list of orders or {\"orders\": [...]}"}, status_code=400)
+    try:
+        # Blocking fan-out; run it off the event loop
+        results = await run_in_threadpool(TOOL_MAP["place_orders"], orders)
+        return JSONResponse({"mode": TOOL_MAP["mode"](), "results": results})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@http_app.post("/screen")
+async def screen_endpoint(request: Request):
+    body = await request.json()
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "Body must be an object"}, status_code=400)
+    try:
+        # Validates everything before the 200 and the first line go out
+        rows = screen_iter(body.get("symbols"), body.get("conditions"), body.get("exchange", "NSE"),
+                           body.get("interval", "ONE_DAY"), bool(body.get("quotes", False)))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    # NDJSON: one line per match/error as batches finish, then a summary line
+    return StreamingResponse((json.dumps(r) + "\n" for r in rows), media_type="application/x-ndjson")
+
 # GET endpoints for read-only actions
 @http_app.get("/ping")
 async def ping_endpoint():
@@ -105,11 +144,18 @@ async def candles_endpoint(request: Request):
         interval = body.get("interval")
         from_date = body.get("from_date")
         to_date = body.get("to_date")
+        indicators = body.get("indicators")
+        # "format" in the body wins; otherwise negotiate on the Accept header
+        fmt = candle_codec.negotiate(body.get("format"), request.headers.get("accept"))
         symboltoken = get_symboltoken(exchange, tradingsymbol)
         if not symboltoken:
             return JSONResponse({"error": f"No symboltoken found for {tradingsymbol} on {exchange}"}, status_code=404)
-        result = TOOL_MAP["candles"](exchange, symboltoken, interval, from_date, to_date)
+        result = TOOL_MAP["candles"](exchange, symboltoken, interval, from_date, to_date, indicators, fmt)
+        if isinstance(result, bytes):
+            return Response(content=result, media_type=candle_codec.BINARY_MEDIA_TYPE)
         return JSONResponse(result)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
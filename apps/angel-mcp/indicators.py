@@ -0,0 +1,199 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Technical indicators over SmartAPI candle rows ([ts, o, h, l, c, v]).
+# Every indicator is vectorized with NumPy and keeps its intermediate arrays
+# per series, so a poll that only appends bars recomputes from the last
+# cached bar (which may still be forming) instead of the full history.
+
+DEFAULT_PERIODS = {"sma": 20, "ema": 20, "rsi": 14, "atr": 14}
+KINDS = ("sma", "ema", "rsi", "atr", "vwap")
+_BLOCK = 64        # keeps r**-k in the EWM closed form well inside float range
+_MAX_SERIES = 256  # LRU bound on cached series
+
+def parse_specs(indicators: Any) -> List[Tuple[str, str, int]]:
+    """Accept "sma:20,rsi" or ["sma:20", "rsi"]; return [(name, kind, period)]."""
+    if isinstance(indicators, str):
+        indicators = indicators.split(",")
+    out: List[Tuple[str, str, int]] = []
+    for raw in indicators or []:
+        spec = str(raw).strip().lower()
+        if not spec:
+            continue
+        kind, _, p = spec.partition(":")
+        if kind not in KINDS:
+            raise ValueError(f"Unknown indicator '{kind}'. Use one of: {', '.join(KINDS)}")
+        if kind == "vwap":
+            out.append(("vwap", kind, 0))
+            continue
+        period = int(p) if p else DEFAULT_PERIODS[kind]
+        if period < 1:
+            raise ValueError(f"Indicator period must be >= 1: {spec}")
+        out.append((f"{kind}:{period}", kind, period))
+    return out
+
+def _ewm(x: np.ndarray, alpha: float, prev: Any) -> np.ndarray:
+    # y[j] = (1-alpha)*y[j-1] + alpha*x[j] along the last axis, in closed form
+    # per block: y[j] = r^(j+1) * (prev + alpha * sum_{i<=j} x[i] / r^(i+1)).
+    # x may be 2-D (one series per row) with prev holding one value per row.
+    r = 1.0 - alpha
+    if r <= 0.0:
+        return x.astype(float, copy=True)
+    out = np.empty(x.shape, dtype=float)
+    prev = np.asarray(prev, dtype=float)[..., None]
+    for s in range(0, x.shape[-1], _BLOCK):
+        xb = x[..., s:s + _BLOCK]
+        pw = r ** np.arange(1, xb.shape[-1] + 1)
+        yb = pw * (prev + alpha * np.cumsum(xb / pw, axis=-1))
+        out[..., s:s + xb.shape[-1]] = yb
+        prev = yb[..., -1:]
+    return out
+
+def _seeded_ewm(x: np.ndarray, n: int, alpha: float, prev: Optional[np.ndarray], start: int) -> np.ndarray:
+    """EWM seeded with the mean of the first n values; NaN during warm-up."""
+    out = np.full(len(x), np.nan)
+    if prev is not None and start > n - 1:
+        out[:start] = prev[:start]
+        out[start:] = _ewm(x[start:], alpha, prev[start - 1])
+        return out
+    if len(x) < n:
+        return out
+    out[n - 1] = x[:n].mean()
+    out[n:] = _ewm(x[n:], alpha, out[n - 1])
+    return out
+
+def _sma(cols, n, prev, start) -> Dict[str, np.ndarray]:
+    c = cols["close"]
+    out = np.full(len(c), np.nan)
+    lo = 0
+    if prev is not None:
+        out[:start] = prev["value"][:start]
+        lo = max(0, start - n + 1)
+    seg = c[lo:]
+    if len(seg) >= n:
+        cs = np.concatenate(([0.0], np.cumsum(seg)))
+        out[lo + n - 1:] = (cs[n:] - cs[:-n]) / n
+    return {"value": out}
+
+def _ema(cols, n, prev, start) -> Dict[str, np.ndarray]:
+    return {"value": _seeded_ewm(cols["close"], n, 2.0 / (n + 1), prev and prev["value"], start)}
+
+def _rsi(cols, n, prev, start) -> Dict[str, np.ndarray]:
+    # Wilder smoothing over close-to-close changes; index 0 has no change
+    c = cols["close"]
+    d = np.diff(c, prepend=np.nan)[1:]
+    gain, loss = np.clip(d, 0, None), np.clip(-d, 0, None)
+    s = max(start - 1, 0)
+    ag = _seeded_ewm(gain, n, 1.0 / n, prev and prev["gain"], s)
+    al = _seeded_ewm(loss, n, 1.0 / n, prev and prev["loss"], s)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(al == 0, 100.0, 100.0 - 100.0 / (1.0 + ag / al))
+    rsi[np.isnan(ag)] = np.nan
+    return {"value": np.concatenate(([np.nan], rsi)), "gain": ag, "loss": al}
+
+def _atr(cols, n, prev, start) -> Dict[str, np.ndarray]:
+    h, l, c = cols["high"], cols["low"], cols["close"]
+    pc = np.concatenate(([np.nan], c[:-1]))
+    tr = np.fmax(h - l, np.fmax(np.abs(h - pc), np.abs(l - pc)))
+    return {"value": _seeded_ewm(tr, n, 1.0 / n, prev and prev["value"], start)}
+
+def _group_cumsum(x: np.ndarray, day: np.ndarray) -> np.ndarray:
+    # Cumulative sum that restarts whenever the day changes. Inputs are
+    # non-negative, so the running total is monotonic and max.accumulate
+    # carries each day's starting offset forward.
+    cs = np.cumsum(x)
+    starts = np.flatnonzero(day[1:] != day[:-1]) + 1
+    reset = np.zeros(len(x))
+    reset[starts] = cs[starts - 1]
+    return cs - np.maximum.accumulate(reset)
+
+def _vwap(cols, _n, prev, start) -> Dict[str, np.ndarray]:
+    # Session VWAP on typical price, reset at each trading day
+    h, l, c, v, day = cols["high"], cols["low"], cols["close"], cols["volume"], cols["day"]
+    pv = (h + l + c) / 3.0 * v
+    if prev is None or start == 0:
+        cpv, cv = _group_cumsum(pv, day), _group_cumsum(v, day)
+    else:
+        cpv = np.concatenate((prev["pv"][:start], _group_cumsum(pv[start:], day[start:])))
+        cv = np.concatenate((prev["v"][:start], _group_cumsum(v[start:], day[start:])))
+        # carry the running totals into the rest of an unfinished day
+        nxt = np.flatnonzero(day[start:] != day[start - 1])
+        end = start + (nxt[0] if len(nxt) else len(day) - start)
+        cpv[start:end] += prev["pv"][start - 1]
+        cv[start:end] += prev["v"][start - 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = np.where(cv > 0, cpv / cv, np.nan)
+    return {"value": value, "pv": cpv, "v": cv}
+
+_FUNCS = {"sma": _sma, "ema": _ema, "rsi": _rsi, "atr": _atr, "vwap": _vwap}
+
+class _Series:
+    __slots__ = ("ts", "state")
+
+    def __init__(self) -> None:
+        self.ts: List[str] = []
+        self.state: Dict[str, Dict[str, np.ndarray]] = {}
+
+_lock = threading.Lock()
+_SERIES: "OrderedDict[Any, _Series]" = OrderedDict()
+
+def _columns(rows: Sequence[Sequence[Any]]) -> Dict[str, np.ndarray]:
+    arr = np.asarray([r[1:6] for r in rows], dtype=float).reshape(-1, 5)
+    return {
+        "open": arr[:, 0], "high": arr[:, 1], "low": arr[:, 2],
+        "close": arr[:, 3], "volume": arr[:, 4],
+        "day": np.asarray([str(r[0])[:10] for r in rows]),
+    }
+
+def _resume_at(old: List[str], new: List[str]) -> int:
+    # Reuse state when `new` extends `old`; the last old bar may have been
+    # revised while it was forming, so restart from it.
+    m = len(old)
+    if m < 2 or len(new) < m or new[0] != old[0] or new[m - 2] != old[m - 2]:
+        return 0
+    return m - 1
+
+def compute(rows: Sequence[Sequence[Any]], specs: List[Tuple[str, str, int]],
+            series_key: Any = None) -> Dict[str, List[Optional[float]]]:
+    """Return {name: values aligned with rows}; warm-up values are None."""
+    if not specs or not rows:
+        return {name: [] for name, _, _ in specs}
+    cols = _columns(rows)
+    ts = [str(r[0]) for r in rows]
+
+    with _lock:
+        series = _SERIES.pop(series_key, None) if series_key is not None else None
+    start = _resume_at(series.ts, ts) if series else 0
+    if series is None or start == 0:
+        series = _Series()
+
+    out: Dict[str, List[Optional[float]]] = {}
+    state: Dict[str, Dict[str, np.ndarray]] = {}
+    for name, kind, period in specs:
+        prev = series.state.get(name) if start else None
+        st = _FUNCS[kind](cols, period, prev, start if prev is not None else 0)
+        state[name] = st
+        vals = np.round(st["value"], 4).astype(object)
+        vals[np.isnan(st["value"])] = None
+        out[name] = vals.tolist()
+
+    if series_key is not None:
+        series.ts, series.state = ts, state
+        with _lock:
+            _SERIES[series_key] = series
+            while len(_SERIES) > _MAX_SERIES:
+                _SERIES.popitem(last=False)
+    return out
+
+def latest_rsi(close: np.ndarray, n: int) -> np.ndarray:
+    """Wilder RSI at the last bar of each row of a (symbols x bars) close matrix."""
+    d = np.diff(close, axis=-1)
+    gain, loss = np.clip(d, 0, None), np.clip(-d, 0, None)
+    ag, al = gain[..., :n].mean(axis=-1), loss[..., :n].mean(axis=-1)
+    if d.shape[-1] > n:
+        ag = _ewm(gain[..., n:], 1.0 / n, ag)[..., -1]
+        al = _ewm(loss[..., n:], 1.0 / n, al)[..., -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(al == 0, 100.0, 100.0 - 100.0 / (1.0 + ag / al))
@@ -1,7 +1,8 @@
-import json, os, time
+import json, os, time, uuid
 from pathlib import Path
 from typing import Dict, Any, List
 from angel_client import AngelClient
+from profiling import profiled
 
 client = AngelClient()
 
@@ -24,6 +25,7 @@ def _normalize_schema(d: Dict[str, Any]) -> Dict[str, Any]:
         d["positions"] = {}
     return d
 
+@profiled("paper_engine._load")
 def _load() -> Dict[str, Any]:
     if not STORE.exists():
         return _empty_store()
@@ -34,6 +36,7 @@ def _load() -> Dict[str, Any]:
         data = {}
     return _normalize_schema(data)
 
+@profiled("paper_engine._save")
 def _save(d: Dict[str, Any]) -> None:
     STORE.write_text(json.dumps(_normalize_schema(d), indent=2))
 
@@ -53,10 +56,6 @@ def _apply_fill(positions: Dict[str, Any], key: str, side: str, qty: int, price:
         pos.update({"qty": pos["qty"] - qty, "avgPrice": pos.get("avgPrice", 0.0)})
     positions[key] = pos
 
-def _prefer_eq(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    eq = [h for h in hits if str(h.get("tradingsymbol", "")).endswith("-EQ")]
-    return eq or hits
-
 def place_order_paper(
     exchange: str,
     tradingsymbol: str,
@@ -80,16 +79,21 @@ def place_order_paper(
 
     # Resolve token/series if needed (prefer -EQ)
     if token is None or not tradingsymbol:
-        hits = client.search_scrip(exchange, tradingsymbol or "")
-        hits = _prefer_eq(hits)
-        if not hits:
-            raise RuntimeError(f"No scrip found for {tradingsymbol or '(empty)'} on {exchange}")
-        top = hits[0]
-        tradingsymbol = str(top.get("tradingsymbol") or tradingsymbol)
-        token = str(top.get("symboltoken") or top.get("token"))
+        tradingsymbol, token = client.resolve_scrip(exchange, tradingsymbol)
 
     # Determine fill price
-    if ordertype == "MARKET":
+    p = fill_price(exchange, tradingsymbol, token, ordertype, price)
+
+    order = _new_order(f"PAPER-{int(time.time() * 1000)}", exchange, tradingsymbol, token,
+                       transactiontype, ordertype, quantity, p)
+
+    # Persist
+    _book(data, order)
+    _save(data)
+    return order
+
+def fill_price(exchange: str, tradingsymbol: str, token: str, ordertype: str, price: float | None) -> float:
+    if (ordertype or "MARKET").upper() == "MARKET":
         l = client.ltp(exchange, tradingsymbol, token)
         # Angel LTP payloads vary; handle both "data": {"ltp": ...} and flat fields
         ltp_val = (
@@ -99,14 +103,14 @@ def place_order_paper(
         )
         if ltp_val is None:
             raise RuntimeError(f"Could not read LTP from response: {l}")
-        p = float(ltp_val)
-    else:
-        if price is None:
-            raise RuntimeError("LIMIT order requires 'price'")
-        p = float(price)
-
-    oid = f"PAPER-{int(time.time() * 1000)}"
-    order = {
+        return float(ltp_val)
+    if price is None:
+        raise RuntimeError("LIMIT order requires 'price'")
+    return float(price)
+
+def _new_order(oid: str, exchange: str, tradingsymbol: str, token: str, transactiontype: str,
+               ordertype: str, quantity: int, p: float) -> Dict[str, Any]:
+    return {
         "orderid": oid,
         "mode": "PAPER",
         "exchange": exchange,
@@ -120,9 +124,27 @@ def place_order_paper(
         "timestamp": int(time.time()),
     }
 
-    # Persist
+def _book(data: Dict[str, Any], order: Dict[str, Any]) -> None:
     data["orders"].append(order)
-    key = f"{exchange}:{tradingsymbol}:{token}"
-    _apply_fill(data["positions"], key, transactiontype, quantity, p)
+    key = f"{order['exchange']}:{order['tradingsymbol']}:{order['symboltoken']}"
+    _apply_fill(data["positions"], key, order["transactiontype"], order["quantity"], order["price"])
+
+def place_orders_paper(fills: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Book already-resolved fills (exchange, tradingsymbol, token, transactiontype,
+    ordertype, quantity, price) with a single load/save of the store."""
+    data = _load()
+    ms = int(time.time() * 1000)
+    out = []
+    for f in fills:
+        order = _new_order(
+            f"PAPER-{ms}-{uuid.uuid4().hex[:12]}",  # unique even for baskets in the same ms
+            f["exchange"].upper(), f["tradingsymbol"].upper(), str(f["token"]),
+            f["transactiontype"].upper(), (f.get("ordertype") or "MARKET").upper(),
+            int(f["quantity"]), float(f["price"]),
+        )
+        if f.get("idempotency_key"):
+            order["idempotency_key"] = f["idempotency_key"]
+        _book(data, order)
+        out.append(order)
     _save(data)
-    return order
+    return out
@@ -0,0 +1,289 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from zoneinfo import ZoneInfo
+import numpy as np
+import angel_client
+from indicators import latest_rsi
+
+# Watchlist screener: fetch candles (and optionally live quotes) for a symbol
+# universe concurrently, stack each completed batch into (symbols x bars)
+# matrices and evaluate every condition as one vector op over the batch.
+#
+# Conditions are "name:arg" strings, all of which must hold:
+#   high_break:N    close above the highest high of the previous N bars
+#   low_break:N     close below the lowest low of the previous N bars
+#   above_sma:N     close above its N-bar SMA
+#   below_sma:N     close below its N-bar SMA
+#   rsi_above:X     14-bar RSI above X
+#   rsi_below:X     14-bar RSI below X
+#   volume_spike:K  volume above K x the average of the previous 20 bars
+#   change_above:P  % change from the previous close above P
+#   change_below:P  % change from the previous close below P
+#
+# Bars are cached per (exchange, token, interval). A re-scan within
+# ANGEL_SCREEN_BAR_TTL seconds (and before a new bar can have opened) makes
+# no candle calls; quotes=true still folds each fresh LTP into the forming
+# bar. After that only the tail from the last cached bar, which may have
+# been forming, is refetched and merged.
+
+WORKERS = int(os.getenv("ANGEL_SCREEN_WORKERS", 8))
+CANDLE_RATE = float(os.getenv("ANGEL_CANDLE_RATE", 3))  # SmartAPI historical-data limit, req/s
+BAR_TTL = float(os.getenv("ANGEL_SCREEN_BAR_TTL", 60))
+BATCH = 8  # small, so matches stream out soon after their candles arrive
+_MAX_CACHED = 4096  # LRU bound on cached series
+RSI_PERIOD = 14
+IST = ZoneInfo("Asia/Kolkata")
+
+_INTERVAL_SECONDS = {"ONE_MINUTE": 60, "THREE_MINUTE": 180, "FIVE_MINUTE": 300, "TEN_MINUTE": 600,
+                     "FIFTEEN_MINUTE": 900, "THIRTY_MINUTE": 1800, "ONE_HOUR": 3600, "ONE_DAY": 86400}
+
+_candle_limiter = angel_client.RateLimiter(CANDLE_RATE)
+
+Cols = Dict[str, np.ndarray]
+
+def _high_break(c: Cols, n: float) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    ref = c["high"][:, -int(n) - 1:-1].max(axis=1)
+    return c["close"][:, -1] > ref, {f"high_{int(n)}": ref}
+
+def _low_break(c: Cols, n: float):
+    ref = c["low"][:, -int(n) - 1:-1].min(axis=1)
+    return c["close"][:, -1] < ref, {f"low_{int(n)}": ref}
+
+def _sma(c: Cols, n: float) -> np.ndarray:
+    return c["close"][:, -int(n):].mean(axis=1)
+
+def _above_sma(c: Cols, n: float):
+    ref = _sma(c, n)
+    return c["close"][:, -1] > ref, {f"sma_{int(n)}": ref}
+
+def _below_sma(c: Cols, n: float):
+    ref = _sma(c, n)
+    return c["close"][:, -1] < ref, {f"sma_{int(n)}": ref}
+
+def _rsi_above(c: Cols, x: float):
+    rsi = latest_rsi(c["close"], RSI_PERIOD)
+    return rsi > x, {f"rsi_{RSI_PERIOD}": rsi}
+
+def _rsi_below(c: Cols, x: float):
+    rsi = latest_rsi(c["close"], RSI_PERIOD)
+    return rsi < x, {f"rsi_{RSI_PERIOD}": rsi}
+
+def _volume_spike(c: Cols, k: float):
+    avg = c["volume"][:, -21:-1].mean(axis=1)
+    return c["volume"][:, -1] > k * avg, {"avg_volume_20": avg}
+
+def _change(c: Cols) -> np.ndarray:
+    return (c["close"][:, -1] / c["close"][:, -2] - 1.0) * 100.0
+
+def _change_above(c: Cols, p: float):
+    ch = _change(c)
+    return ch > p, {"change_pct": ch}
+
+def _change_below(c: Cols, p: float):
+    ch = _change(c)
+    return ch < p, {"change_pct": ch}
+
+# name -> (evaluator, bars needed for a given argument)
+_CONDITIONS: Dict[str, Tuple[Callable, Callable[[float], int]]] = {
+    "high_break": (_high_break, lambda n: int(n) + 1),
+    "low_break": (_low_break, lambda n: int(n) + 1),
+    "above_sma": (_above_sma, lambda n: int(n)),
+    "below_sma": (_below_sma, lambda n: int(n)),
+    "rsi_above": (_rsi_above, lambda _: 5 * RSI_PERIOD + 1),  # room for Wilder smoothing to settle
+    "rsi_below": (_rsi_below, lambda _: 5 * RSI_PERIOD + 1),
+    "volume_spike": (_volume_spike, lambda _: 21),
+    "change_above": (_change_above, lambda _: 2),
+    "change_below": (_change_below, lambda _: 2),
+}
+
+def parse_conditions(conditions: Any) -> List[Tuple[str, Callable, float, int]]:
+    """Accept "high_break:20,rsi_above:60" or a list; return [(spec, fn, arg, bars_needed)]."""
+    if isinstance(conditions, str):
+        conditions = conditions.split(",")
+    out = []
+    for raw in conditions or []:
+        spec = str(raw).strip().lower()
+        if not spec:
+            continue
+        name, _, arg = spec.partition(":")
+        if name not in _CONDITIONS:
+            raise ValueError(f"Unknown condition '{name}'. Use one of: {', '.join(_CONDITIONS)}")
+        try:
+            val = float(arg)
+        except ValueError:
+            raise ValueError(f"Condition needs a numeric argument: {spec}") from None
+        if name in ("high_break", "low_break", "above_sma", "below_sma") and val < 1:
+            raise ValueError(f"Condition period must be >= 1: {spec}")
+        fn, need = _CONDITIONS[name]
+        out.append((spec, fn, val, need(val)))
+    if not out:
+        raise ValueError("At least one condition is required")
+    return out
+
+def _window(interval: str, bars: int) -> Tuple[str, str]:
+    # Calendar span that covers `bars` trading bars, with slack for holidays
+    per_day = {"ONE_DAY": 1, "ONE_HOUR": 6, "THIRTY_MINUTE": 12, "FIFTEEN_MINUTE": 25,
+               "TEN_MINUTE": 37, "FIVE_MINUTE": 75, "THREE_MINUTE": 125, "ONE_MINUTE": 375}
+    days = int(bars / per_day.get(interval, 1) * 7 / 5) + 10
+    now = datetime.now(IST)
+    fmt = "%Y-%m-%d %H:%M"
+    return (now - timedelta(days=days)).strftime(fmt), now.strftime(fmt)
+
+class _Bars:
+    __slots__ = ("from_dt", "stamps", "bars", "fetched", "due")
+
+    def __init__(self, from_dt: str, stamps: List[str], bars: np.ndarray, interval: str) -> None:
+        self.from_dt, self.stamps, self.bars = from_dt, stamps, bars
+        self.fetched = time.time()
+        # When the bar after the last one can open; a fetch older than that is stale
+        last = datetime.fromisoformat(stamps[-1])
+        self.due = last.timestamp() + _INTERVAL_SECONDS.get(interval, 86400)
+
+    def fresh(self, now: float) -> bool:
+        return now - self.fetched < BAR_TTL and not (self.fetched < self.due <= now)
+
+_lock = threading.Lock()
+_SERIES: "OrderedDict[Tuple[str, str, str], _Bars]" = OrderedDict()
+_TOKENS: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+def _resolve(client: angel_client.AngelClient, exchange: str, symbol: str) -> Tuple[str, str]:
+    hit = _TOKENS.get((exchange, symbol))
+    if hit is None:
+        hit = _TOKENS[(exchange, symbol)] = client.resolve_scrip(exchange, symbol)
+    return hit
+
+def _local(stamp: str) -> str:
+    # "2025-09-15T09:15:00+05:30" -> "2025-09-15 09:15", the format candles() takes
+    return stamp[:16].replace("T", " ")
+
+def _rows(client: angel_client.AngelClient, exchange: str, token: str, interval: str,
+          from_dt: str, to_dt: str) -> Tuple[List[str], np.ndarray]:
+    _candle_limiter.wait()
+    rows = client.candles(exchange, token, interval, from_dt, to_dt).get("data") or []
+    return [str(r[0]) for r in rows], np.asarray([r[1:6] for r in rows], dtype=float).reshape(-1, 5)
+
+def _series(client: angel_client.AngelClient, exchange: str, token: str, interval: str,
+            from_dt: str, to_dt: str) -> np.ndarray:
+    key = (exchange, token, interval)
+    with _lock:
+        cached = _SERIES.get(key)
+    if cached is not None and cached.from_dt <= from_dt and cached.fresh(time.time()):
+        return cached.bars
+
+    if cached is None or cached.from_dt > from_dt:
+        stamps, bars = _rows(client, exchange, token, interval, from_dt, to_dt)
+    else:
+        # Refetch from the last cached bar on; it and anything after are replaced
+        tail_stamps, tail = _rows(client, exchange, token, interval, _local(cached.stamps[-1]), to_dt)
+        keep = len(cached.stamps)
+        if tail_stamps:
+            keep = next((i for i, s in enumerate(cached.stamps) if s >= tail_stamps[0]), len(cached.stamps))
+        first = next((i for i, s in enumerate(cached.stamps[:keep]) if _local(s) >= from_dt), keep)
+        stamps = cached.stamps[first:keep] + tail_stamps
+        bars = np.concatenate((cached.bars[first:keep], tail))
+
+    if stamps:
+        with _lock:
+            _SERIES[key] = _Bars(from_dt, stamps, bars, interval)
+            _SERIES.move_to_end(key)
+            while len(_SERIES) > _MAX_CACHED:
+                _SERIES.popitem(last=False)
+    return bars
+
+def _fetch(client: angel_client.AngelClient, exchange: str, symbol: str, interval: str,
+           from_dt: str, to_dt: str, quotes: bool) -> Dict[str, Any]:
+    tsym, token = _resolve(client, exchange, symbol)
+    bars = _series(client, exchange, token, interval, from_dt, to_dt)
+    if quotes and len(bars):
+        # Fold the live price into the forming bar, on a copy of the cached bars
+        bars = bars.copy()
+        l = client.ltp(exchange, tsym, token)
+        ltp = (l.get("data") or {}).get("ltp") if isinstance(l.get("data"), dict) else None
+        if ltp is not None:
+            last = bars[-1]
+            last[3] = float(ltp)
+            last[1], last[2] = max(last[1], last[3]), min(last[2], last[3])
+    return {"symbol": symbol, "tradingsymbol": tsym, "token": token, "bars": bars}
+
+def _evaluate(batch: List[Dict[str, Any]], conds, need: int, exchange: str) -> Iterator[Dict[str, Any]]:
+    ok = [b for b in batch if len(b["bars"]) >= need]
+    for b in batch:
+        if len(b["bars"]) < need:
+            yield {"symbol": b["symbol"], "error": f"only {len(b['bars'])} bars, need {need}"}
+    if not ok:
+        return
+    stack = np.stack([b["bars"][-need:] for b in ok])  # symbols x bars x OHLCV
+    cols = {k: stack[:, :, i] for i, k in enumerate(("open", "high", "low", "close", "volume"))}
+    hit = np.ones(len(ok), dtype=bool)
+    metrics: Dict[str, np.ndarray] = {}
+    for _, fn, arg, _ in conds:
+        mask, m = fn(cols, arg)
+        hit &= mask
+        metrics.update(m)
+    for i in np.flatnonzero(hit):
+        b = ok[i]
+        yield {
+            "symbol": b["symbol"], "exchange": exchange, "tradingsymbol": b["tradingsymbol"],
+            "token": b["token"], "close": float(cols["close"][i, -1]),
+            "metrics": {k: round(float(v[i]), 4) for k, v in metrics.items()},
+        }
+
+def parse_symbols(symbols: Any) -> List[str]:
+    """Normalize a symbol list (upper-cased, de-duplicated, blanks dropped)."""
+    if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+        raise ValueError("symbols must be a list of strings")
+    universe = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+    if not universe:
+        raise ValueError("symbols must be a non-empty list")
+    return universe
+
+def scan(client: angel_client.AngelClient, symbols: List[str], conditions: Any,
+         exchange: str = "NSE", interval: str = "ONE_DAY", quotes: bool = False) -> Iterator[Dict[str, Any]]:
+    """Yield {"symbol", ..., "metrics"} for each match and {"symbol", "error"} for
+    symbols that could not be evaluated, as batches complete; ends with a summary.
+
+    Arguments are validated here, before the first row is requested, so a bad
+    request raises ValueError instead of failing mid-stream."""
+    conds = parse_conditions(conditions)
+    universe = parse_symbols(symbols)
+    if not isinstance(exchange or "", str) or not isinstance(interval or "", str):
+        raise ValueError("exchange and interval must be strings")
+    exchange = (exchange or "NSE").upper()
+    interval = (interval or "ONE_DAY").upper()
+    return _scan(client, universe, conds, exchange, interval, quotes)
+
+def _scan(client: angel_client.AngelClient, universe: List[str], conds, exchange: str,
+          interval: str, quotes: bool) -> Iterator[Dict[str, Any]]:
+    need = max(c[3] for c in conds)
+    from_dt, to_dt = _window(interval, need)
+
+    matched = errors = 0
+    batch: List[Dict[str, Any]] = []
+    pool = ThreadPoolExecutor(max_workers=WORKERS)
+    try:
+        futs = {pool.submit(_fetch, client, exchange, s, interval, from_dt, to_dt, quotes): s for s in universe}
+        pending = len(futs)
+        for fut in as_completed(futs):
+            pending -= 1
+            try:
+                batch.append(fut.result())
+            except Exception as e:
+                errors += 1
+                yield {"symbol": futs[fut], "error": str(e)}
+            if len(batch) >= BATCH or (pending == 0 and batch):
+                for row in _evaluate(batch, conds, need, exchange):
+                    if "error" in row:
+                        errors += 1
+                    else:
+                        matched += 1
+                    yield row
+                batch = []
+    finally:
+        # Stop queued fetches if the consumer goes away mid-stream
+        pool.shutdown(wait=False, cancel_futures=True)
+    yield {"done": True, "scanned": len(universe), "matched": matched, "failed": errors}
@@ -1,6 +1,6 @@
 from mcp.server.fastmcp import FastMCP
-import sys, os
-from tools_shared import ping, Yo, angel_login_status, angel_login, angel_logout, angel_search_scrip, angel_ltp, angel_candles, angel_mode, angel_set_mode, place_order, list_orders, list_positions
+import sys, os, base64
+from tools_shared import ping, Yo, angel_login_status, angel_login, angel_logout, angel_search_scrip, angel_ltp, angel_candles, angel_mode, angel_set_mode, place_order, place_orders, screen, list_orders, list_positions
 
 app = FastMCP("angel-one-mcp")
 
@@ -33,8 +33,14 @@ def angel_ltp_tool(exchange: str, tradingsymbol: str, token: str):
     return angel_ltp(exchange, tradingsymbol, token)
 
 @app.tool()
-def angel_candles_tool(exchange: str, token: str, interval: str, from_dt: str, to_dt: str):
-    return angel_candles(exchange, token, interval, from_dt, to_dt)
+def angel_candles_tool(exchange: str, token: str, interval: str, from_dt: str, to_dt: str,
+                       indicators: list[str] | None = None, format: str = "json"):
+    """indicators: optional specs like ["sma:20", "ema:50", "rsi:14", "vwap", "atr:14"].
+    format: "json" (SmartAPI rows), "columnar" or "binary" (base64 of application/x-candles)."""
+    result = angel_candles(exchange, token, interval, from_dt, to_dt, indicators, format)
+    if isinstance(result, bytes):
+        return {"format": "binary", "encoding": "base64", "data": base64.b64encode(result).decode("ascii")}
+    return result
 
 @app.tool()
 def angel_mode_tool():
@@ -50,6 +56,19 @@ def place_order_tool(exchange: str, tradingsymbol: str, transactiontype: str,
                 price: float | None = None, token: str | None = None):
     return place_order(exchange, tradingsymbol, transactiontype, quantity, ordertype, price, token)
 
+@app.tool()
+def place_orders_tool(orders: list[dict]):
+    """Place a basket. Each order: exchange, tradingsymbol, transactiontype, quantity,
+    optional ordertype/price/token and idempotency_key (a retried key is never placed twice)."""
+    return place_orders(orders)
+
+@app.tool()
+def screen_tool(symbols: list[str], conditions: list[str], exchange: str = "NSE",
+                interval: str = "ONE_DAY", quotes: bool = False):
+    """Scan symbols for bars meeting all conditions, e.g. ["high_break:20", "volume_spike:2"].
+    See screener.py for the condition list; quotes=True folds the live LTP into the last bar."""
+    return screen(symbols, conditions, exchange, interval, quotes)
+
 @app.tool()
 def list_orders_tool():
     return list_orders()
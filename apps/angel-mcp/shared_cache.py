@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from typing import Any, Optional
+
+# Optional cache tier shared by every worker process on the host, backed by a
+# single SQLite file in WAL mode. Disabled (all gets miss, sets are no-ops)
+# unless SHARED_CACHE_PATH is set. Writes are single INSERT OR REPLACE
+# statements, so readers in other processes only ever see whole values.
+#
+# The file holds the live SmartAPI session (JWT and refresh token), so it is
+# created owner-only (0600) and tightened to that if it already exists;
+# SQLite gives its -wal/-shm files the same mode.
+
+PATH = os.getenv("SHARED_CACHE_PATH")
+_PRUNE_EVERY = 256
+
+log = logging.getLogger("shared_cache")
+_local = threading.local()
+_writes = 0
+
+def _db() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        _restrict(PATH)
+        conn = sqlite3.connect(PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        _local.conn = conn
+    return conn
+
+def _restrict(path: str) -> None:
+    os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+    for p in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(p) and os.stat(p).st_mode & 0o077:
+            os.chmod(p, 0o600)
+
+def get_bytes(key: str) -> Optional[bytes]:
+    if not PATH:
+        return None
+    try:
+        row = _db().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+    except (sqlite3.Error, OSError) as e:
+        log.warning("shared cache read failed for %s: %s", key, e)
+        return None
+    return row[0] if row else None
+
+def set_bytes(key: str, value: bytes, ttl: float) -> None:
+    global _writes
+    if not PATH:
+        return
+    now = time.time()
+    try:
+        conn = _db()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache(key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl),
+        )
+        _writes += 1
+        if _writes % _PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+    except (sqlite3.Error, OSError) as e:
+        log.warning("shared cache write failed for %s: %s", key, e)
+
+def add_bytes(key: str, value: bytes, ttl: float) -> Optional[bool]:
+    """Store only if the key is absent or expired. True if stored, False if
+    another live value exists, None if the tier is disabled or unavailable."""
+    if not PATH:
+        return None
+    now = time.time()
+    try:
+        cur = _db().execute(
+            "INSERT INTO cache(key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE cache.expires_at <= ?",
+            (key, value, now + ttl, now),
+        )
+    except (sqlite3.Error, OSError) as e:
+        log.warning("shared cache add failed for %s: %s", key, e)
+        return None
+    return cur.rowcount == 1
+
+def delete(key: str) -> None:
+    if not PATH:
+        return
+    try:
+        _db().execute("DELETE FROM cache WHERE key = ?", (key,))
+    except (sqlite3.Error, OSError) as e:
+        log.warning("shared cache delete failed for %s: %s", key, e)
+
+def get_json(key: str) -> Any:
+    raw = get_bytes(key)
+    return json.loads(raw) if raw is not None else None
+
+def add_json(key: str, value: Any, ttl: float) -> Optional[bool]:
+    return add_bytes(key, json.dumps(value, separators=(",", ":")).encode("utf-8"), ttl)
+
+def set_json(key: str, value: Any, ttl: float) -> None:
+    if PATH:
+        set_bytes(key, json.dumps(value, separators=(",", ":")).encode("utf-8"), ttl)
@@ -0,0 +1,239 @@
+import os
+import json
+import fcntl
+import mmap
+import time
+import struct
+import bisect
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+import candle_codec
+
+# Tick recording and replay for AngelClient.
+#
+# TICK_RECORD_PATH: append every upstream quote, candle response and scrip
+#   lookup (cache hits are not upstream, so they are not recorded).
+# TICK_REPLAY_PATH: serve those calls from a recording instead of SmartAPI,
+#   with no login or network. A replay clock starts at the first record and
+#   runs TICK_REPLAY_SPEED times faster than wall time; each call returns the
+#   latest record for its key at the replay clock. TICK_REPLAY_LOOP=1 wraps
+#   the clock at the end of the recording for long load runs.
+#
+# File layout, all little-endian:
+#   b"TICK" | u32 version
+#   records: u32 rec_len | u16 key_len | u8 kind | pad | f64 ts | u32 body_len | pad(4)
+#            | key (utf-8) | pad to 8 | body | pad to 8
+#   quote body:   5 x f64 open, high, low, close, ltp (exact for any tick size)
+#   candles body: candle_codec binary payload (8-byte aligned columns)
+#   scrip body:   compact JSON list
+# Records are written with one O_APPEND write each, so concurrent writers
+# never interleave, and every body starts on an 8-byte boundary of the mapped
+# file. The file header is written under an exclusive flock, so workers that
+# start recording at the same moment write it exactly once.
+
+RECORD_PATH = os.getenv("TICK_RECORD_PATH")
+REPLAY_PATH = os.getenv("TICK_REPLAY_PATH")
+REPLAY_SPEED = float(os.getenv("TICK_REPLAY_SPEED", 1))
+REPLAY_LOOP = os.getenv("TICK_REPLAY_LOOP", "0").lower() in ("1", "true", "yes")
+
+QUOTE, CANDLES, SCRIP = 1, 2, 3
+_MAGIC = b"TICK"
+_VERSION = 2
+_FILE_HDR = struct.Struct("<4sI")
+_REC_HDR = struct.Struct("<IHBxdI4x")
+_QUOTE = struct.Struct("<5d")
+_QUOTE_FIELDS = ("open", "high", "low", "close", "ltp")
+
+log = logging.getLogger("ticks")
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+def _record(kind: int, key: str, body: bytes, ts: float) -> bytes:
+    k = key.encode("utf-8")
+    head = _align(_REC_HDR.size + len(k))
+    total = _align(head + len(body))
+    out = bytearray(total)
+    _REC_HDR.pack_into(out, 0, total, len(k), kind, ts, len(body))
+    out[_REC_HDR.size:_REC_HDR.size + len(k)] = k
+    out[head:head + len(body)] = body
+    return bytes(out)
+
+class TickWriter:
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._broken = False
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                self._write_all(_FILE_HDR.pack(_MAGIC, _VERSION))
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _write_all(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+
+    def write(self, kind: int, key: str, body: bytes) -> None:
+        rec = _record(kind, key, body, time.time())
+        with self._lock:
+            if self._broken:
+                return
+            try:
+                self._write_all(rec)
+            except OSError:
+                # A partial record would misalign everything after it, so
+                # stop here; the reader drops the truncated tail.
+                self._broken = True
+                raise
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+class TickReader:
+    """Memory-maps a recording and indexes it by key; bodies are read lazily."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = _FILE_HDR.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a v{_VERSION} tick file")
+        # key -> (timestamps, (offset, length) of each body), in file order
+        self._index: Dict[Tuple[int, str], Tuple[List[float], List[Tuple[int, int]]]] = \
+            defaultdict(lambda: ([], []))
+        self._latest: Dict[str, str] = {}  # candle instrument prefix -> last full key
+        self.count = 0
+        self.start = self.end = 0.0
+
+        pos, size = _FILE_HDR.size, len(self._mm)
+        while pos + _REC_HDR.size <= size:
+            total, klen, kind, ts, blen = _REC_HDR.unpack_from(self._mm, pos)
+            if total < _REC_HDR.size or pos + total > size:
+                log.warning("ignoring truncated record at offset %d of %s", pos, path)
+                break
+            key = bytes(self._mm[pos + _REC_HDR.size:pos + _REC_HDR.size + klen]).decode("utf-8")
+            stamps, bodies = self._index[(kind, key)]
+            stamps.append(ts)
+            bodies.append((pos + _align(_REC_HDR.size + klen), blen))
+            if kind == CANDLES:
+                self._latest[key.rsplit("|", 2)[0]] = key
+            if not self.count:
+                self.start = ts
+            self.end = max(self.end, ts)
+            self.count += 1
+            pos += total
+        self._t0 = time.monotonic()
+
+    def now(self) -> float:
+        """Replay clock, in the recording's epoch seconds."""
+        elapsed = (time.monotonic() - self._t0) * REPLAY_SPEED
+        span = self.end - self.start
+        if REPLAY_LOOP and span > 0:
+            elapsed %= span
+        return self.start + elapsed
+
+    def _body(self, kind: int, key: str) -> Optional[memoryview]:
+        entry = self._index.get((kind, key))
+        if not entry:
+            return None
+        stamps, bodies = entry
+        # Latest record at the replay clock; before the first, serve the first
+        i = max(bisect.bisect_right(stamps, self.now()) - 1, 0)
+        off, n = bodies[i]
+        return memoryview(self._mm)[off:off + n]
+
+    def quote(self, ex: str, tsym: str, tok: str) -> Optional[Dict[str, Any]]:
+        body = self._body(QUOTE, f"{ex}|{tok}")
+        if body is None:
+            return None
+        vals = _QUOTE.unpack_from(body)
+        data: Dict[str, Any] = {"exchange": ex, "tradingsymbol": tsym, "symboltoken": tok}
+        data.update(zip(_QUOTE_FIELDS, vals))
+        return {"status": True, "message": "SUCCESS", "errorcode": "", "data": data}
+
+    def candles(self, ex: str, tok: str, interval: str, from_dt: str, to_dt: str) -> Optional[Dict[str, Any]]:
+        # Callers such as the screener derive their window from the current
+        # time, so fall back to the instrument's latest recorded window.
+        prefix = f"{ex}|{tok}|{interval}"
+        key = f"{prefix}|{from_dt}|{to_dt}"
+        if (CANDLES, key) not in self._index:
+            key = self._latest.get(prefix, key)
+        body = self._body(CANDLES, key)
+        return candle_codec.from_binary(body) if body is not None else None
+
+    def scrip(self, ex: str, query: str) -> Optional[List[Dict[str, Any]]]:
+        body = self._body(SCRIP, f"{ex}|{query.upper()}")
+        return json.loads(bytes(body)) if body is not None else None
+
+_writer: Optional[TickWriter] = None
+_reader: Optional[TickReader] = None
+_init_lock = threading.Lock()
+
+def _get_writer() -> TickWriter:
+    global _writer
+    if _writer is None:
+        with _init_lock:
+            if _writer is None:
+                _writer = TickWriter(RECORD_PATH)
+    return _writer
+
+def _get_reader() -> TickReader:
+    global _reader
+    if _reader is None:
+        with _init_lock:
+            if _reader is None:
+                _reader = TickReader(REPLAY_PATH)
+                log.info("replaying %d records from %s at %gx", _reader.count, REPLAY_PATH, REPLAY_SPEED)
+    return _reader
+
+def _write(kind: int, key: str, body: bytes) -> None:
+    try:
+        _get_writer().write(kind, key, body)
+    except OSError as e:
+        log.warning("tick record failed for %s: %s", key, e)
+
+# ---------- Recording (no-ops unless TICK_RECORD_PATH is set) ----------
+def record_quote(ex: str, tok: str, resp: Dict[str, Any]) -> None:
+    if not RECORD_PATH:
+        return
+    data = resp.get("data")
+    if not isinstance(data, dict):
+        return
+    try:
+        vals = [float(data.get(k) or 0) for k in _QUOTE_FIELDS]
+    except (TypeError, ValueError):
+        return
+    _write(QUOTE, f"{ex}|{tok}", _QUOTE.pack(*vals))
+
+def record_candles(ex: str, tok: str, interval: str, from_dt: str, to_dt: str, resp: Dict[str, Any]) -> None:
+    if not RECORD_PATH:
+        return
+    body = candle_codec.to_binary({"data": resp.get("data") or []})
+    _write(CANDLES, f"{ex}|{tok}|{interval}|{from_dt}|{to_dt}", body)
+
+def record_scrip(ex: str, query: str, results: List[Dict[str, Any]]) -> None:
+    if not RECORD_PATH:
+        return
+    body = json.dumps(results, separators=(",", ":")).encode("utf-8")
+    _write(SCRIP, f"{ex}|{query.upper()}", body)
+
+# ---------- Replay (only when TICK_REPLAY_PATH is set) ----------
+def replay_quote(ex: str, tsym: str, tok: str) -> Dict[str, Any]:
+    resp = _get_reader().quote(ex, tsym, tok)
+    if resp is None:
+        raise RuntimeError(f"ltp: no recorded quote for {ex}:{tsym} ({tok})")
+    return resp
+
+def replay_candles(ex: str, tok: str, interval: str, from_dt: str, to_dt: str) -> Dict[str, Any]:
+    resp = _get_reader().candles(ex, tok, interval, from_dt, to_dt)
+    if resp is None:
+        raise RuntimeError(f"candles: no recorded {interval} candles for {ex}:{tok}")
+    return resp
+
+def replay_scrip(ex: str, query: str) -> List[Dict[str, Any]]:
+    return _get_reader().scrip(ex, query) or []
@@ -1,11 +1,31 @@
 import os
-from typing import Dict, Any
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 import angel_client
 import paper_engine
+import candle_codec
+import shared_cache
+import screener
+from profiling import profiled, span
 
 MODE = os.getenv("ANGEL_MODE", "PAPER").upper()
 client = angel_client.AngelClient()
 
+# Bulk orders: LIVE dispatch is paced below SmartAPI's order rate limit, and
+# idempotency keys are remembered for a day (across workers when the shared
+# cache is enabled) so a retried basket never places an order twice.
+ORDER_RATE = float(os.getenv("ANGEL_ORDER_RATE", 10))  # orders per second
+IDEMPOTENCY_TTL = 24 * 3600
+_BULK_WORKERS = 8
+_PENDING = {"ok": False, "error": "order with this idempotency_key is still in progress"}
+
+_order_limiter = angel_client.RateLimiter(ORDER_RATE)
+_idem_lock = threading.Lock()
+_idem: Dict[str, tuple[float, Dict[str, Any]]] = {}
+
 def ping() -> str:
     return "pong"
 def Yo() -> str:
@@ -16,13 +36,20 @@ def angel_login():
     return client.force_login()
 def angel_logout():
     return client.logout()
+@profiled("angel_search_scrip")
 def angel_search_scrip(exchange: str, query: str):
     result = client.search_scrip(exchange, query)
     return result
+@profiled("angel_ltp")
 def angel_ltp(exchange: str, tradingsymbol: str, token: str):
     return client.ltp(exchange, tradingsymbol, token)
-def angel_candles(exchange: str, token: str, interval: str, from_dt: str, to_dt: str):
-    return client.candles(exchange, token, interval, from_dt, to_dt)
+@profiled("angel_candles")
+def angel_candles(exchange: str, token: str, interval: str, from_dt: str, to_dt: str,
+                  indicators: list[str] | None = None, fmt: str = "json"):
+    fmt = candle_codec.negotiate(fmt)
+    resp = client.candles(exchange, token, interval, from_dt, to_dt, indicators)
+    with span("candle_codec.encode"):
+        return candle_codec.encode(resp, fmt)
 def angel_mode() -> str:
     return MODE
 def angel_set_mode(new_mode: str) -> str:
@@ -32,6 +59,7 @@ def angel_set_mode(new_mode: str) -> str:
         raise ValueError("Mode must be PAPER or LIVE")
     MODE = nm
     return MODE
+@profiled("place_order")
 def place_order(exchange: str, tradingsymbol: str, transactiontype: str,
                 quantity: int, ordertype: str = "MARKET",
                 price: float | None = None, token: str | None = None):
@@ -40,10 +68,10 @@ def place_order(exchange: str, tradingsymbol: str, transactiontype: str,
             exchange, tradingsymbol, quantity, transactiontype, ordertype, price, token
         )
     if token is None:
-        hits = client.search_scrip(exchange, tradingsymbol)
-        if not hits:
-            raise RuntimeError(f"No scrip found for {tradingsymbol} on {exchange}")
-        token = str(hits[0]["token"])
+        tradingsymbol, token = client.resolve_scrip(exchange, tradingsymbol)
+    return client.place_order_live(_live_params(exchange, tradingsymbol, transactiontype, quantity, ordertype, price, token))
+def _live_params(exchange: str, tradingsymbol: str, transactiontype: str, quantity: int,
+                 ordertype: str, price: float | None, token: str) -> Dict[str, Any]:
     params: Dict[str, Any] = {
         "variety": "NORMAL",
         "tradingsymbol": tradingsymbol,
@@ -59,7 +87,179 @@ def place_order(exchange: str, tradingsymbol: str, transactiontype: str,
         if price is None:
             raise ValueError("LIMIT orders need 'price'")
         params["price"] = float(price)
-    return client.place_order_live(params)
+    return params
+def _claim(key: str) -> Optional[Dict[str, Any]]:
+    """Reserve an idempotency key. None if reserved for this call, else the stored result."""
+    now = time.time()
+    with _idem_lock:
+        hit = _idem.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+        if shared_cache.add_json(f"order:{key}", _PENDING, IDEMPOTENCY_TTL) is False:
+            return shared_cache.get_json(f"order:{key}") or _PENDING
+        _idem[key] = (now + IDEMPOTENCY_TTL, _PENDING)
+        if len(_idem) > 10000:
+            for k in [k for k, (exp, _) in _idem.items() if exp <= now]:
+                del _idem[k]
+        return None
+def _remember(key: str, result: Dict[str, Any]) -> None:
+    with _idem_lock:
+        _idem[key] = (time.time() + IDEMPOTENCY_TTL, result)
+    shared_cache.set_json(f"order:{key}", result, IDEMPOTENCY_TTL)
+def _release(key: str) -> None:
+    # Nothing reached the broker or the ledger under this key; let a retry through
+    with _idem_lock:
+        _idem.pop(key, None)
+    shared_cache.delete(f"order:{key}")
+def _attempt(fn, *args) -> tuple[Any, Optional[str]]:
+    try:
+        return fn(*args), None
+    except Exception as e:
+        return None, str(e)
+def _parse_order(raw: Any) -> tuple[Dict[str, Any], Optional[str]]:
+    """Normalize one basket entry; returns (order, validation error or None)."""
+    if not isinstance(raw, dict):
+        return {"idempotency_key": None}, "order must be an object"
+    o: Dict[str, Any] = {
+        "exchange": str(raw.get("exchange") or "").strip().upper(),
+        "tradingsymbol": str(raw.get("tradingsymbol") or "").strip().upper(),
+        "transactiontype": str(raw.get("transactiontype") or "BUY").strip().upper(),
+        "ordertype": str(raw.get("ordertype") or "MARKET").strip().upper(),
+        "token": str(raw["token"]).strip() if raw.get("token") else None,
+        "idempotency_key": str(raw.get("idempotency_key") or "").strip() or None,
+    }
+    if not o["exchange"] or not o["tradingsymbol"]:
+        return o, "exchange and tradingsymbol are required"
+    if o["transactiontype"] not in ("BUY", "SELL"):
+        return o, "transactiontype must be BUY or SELL"
+    qty = raw.get("quantity")
+    try:
+        if isinstance(qty, bool):
+            raise TypeError
+        o["quantity"] = int(qty)
+    except (TypeError, ValueError):
+        return o, "quantity must be a positive integer"
+    if o["quantity"] < 1:
+        return o, "quantity must be a positive integer"
+    try:
+        o["price"] = float(raw["price"]) if raw.get("price") is not None else None
+    except (TypeError, ValueError):
+        return o, "price must be a number"
+    if o["ordertype"] != "MARKET" and o["price"] is None:
+        return o, f"{o['ordertype']} orders need 'price'"
+    return o, None
+def _fill_error(o: Dict[str, Any]) -> Optional[str]:
+    # Last check before the single-transaction ledger write, so one bad fill
+    # cannot fail the rest of the basket
+    p = o.get("price")
+    if not isinstance(p, (int, float)) or isinstance(p, bool) or not math.isfinite(p) or p <= 0:
+        return f"no usable fill price ({p!r})"
+    return None
+@profiled("place_orders")
+def place_orders(orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Place a basket. Each order takes the place_order fields plus an optional
+    idempotency_key; returns one result per order, in input order."""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(orders)
+    claimed: set[str] = set()
+
+    def _fail(i: int, o: Dict[str, Any], error: str) -> None:
+        # Rejected before dispatch: reported, but not stored under the key
+        results[i] = {"ok": False, "error": error, "index": i, "idempotency_key": o["idempotency_key"]}
+
+    def _done(i: int, o: Dict[str, Any], value: Any, error: Optional[str]) -> None:
+        # Sent to the broker or booked in the ledger: the outcome is final
+        res = {"ok": True, "order": value} if error is None else {"ok": False, "error": error}
+        key = o["idempotency_key"]
+        if key:
+            _remember(key, res)
+            claimed.discard(key)
+        results[i] = {**res, "index": i, "idempotency_key": key}
+
+    # Validate the whole basket before claiming any key
+    parsed: List[tuple[int, Dict[str, Any]]] = []
+    for i, raw in enumerate(orders):
+        o, err = _parse_order(raw)
+        if err:
+            _fail(i, o, err)
+        else:
+            parsed.append((i, o))
+
+    try:
+        todo: List[tuple[int, Dict[str, Any]]] = []
+        for i, o in parsed:
+            key = o["idempotency_key"]
+            if key:
+                prior = _claim(key)
+                if prior is not None:
+                    results[i] = {**prior, "index": i, "idempotency_key": key, "replayed": True}
+                    continue
+                claimed.add(key)
+            todo.append((i, o))
+
+        # Resolve every distinct symbol once, concurrently, before any order goes out
+        need = sorted({(o["exchange"], o["tradingsymbol"]) for _, o in todo if o["token"] is None})
+        with ThreadPoolExecutor(max_workers=_BULK_WORKERS) as pool:
+            resolved = dict(zip(need, pool.map(lambda k: _attempt(client.resolve_scrip, *k), need)))
+            ready = []
+            for i, o in todo:
+                if o["token"] is None:
+                    hit, err = resolved[(o["exchange"], o["tradingsymbol"])]
+                    if err:
+                        _fail(i, o, err)
+                        continue
+                    o["tradingsymbol"], o["token"] = hit
+                ready.append((i, o))
+
+            if MODE == "PAPER":
+                # Fill prices concurrently (one LTP per symbol), then book the whole
+                # basket in a single ledger load/save
+                syms = sorted({(o["exchange"], o["tradingsymbol"], o["token"]) for _, o in ready if o["ordertype"] == "MARKET"})
+                ltps = dict(zip(syms, pool.map(lambda s: _attempt(paper_engine.fill_price, *s, "MARKET", None), syms)))
+                fills = []
+                for i, o in ready:
+                    if o["ordertype"] == "MARKET":
+                        p, err = ltps[(o["exchange"], o["tradingsymbol"], o["token"])]
+                        if err:
+                            _fail(i, o, err)
+                            continue
+                        o["price"] = p
+                    err = _fill_error(o)
+                    if err:
+                        _fail(i, o, err)
+                        continue
+                    fills.append((i, o))
+                booked, err = _attempt(paper_engine.place_orders_paper, [o for _, o in fills])
+                for n, (i, o) in enumerate(fills):
+                    if err:
+                        _fail(i, o, err)
+                    else:
+                        _done(i, o, booked[n], None)
+            else:
+                def _send(item: tuple[int, Dict[str, Any]]) -> None:
+                    i, o = item
+                    params = _live_params(o["exchange"], o["tradingsymbol"], o["transactiontype"],
+                                          o["quantity"], o["ordertype"], o["price"], o["token"])
+                    _order_limiter.wait()
+                    _done(i, o, *_attempt(client.place_order_live, params))
+                list(pool.map(_send, ready))
+    finally:
+        for key in claimed:
+            _release(key)
+    return results
+def screen_iter(symbols: List[str], conditions: Any, exchange: str = "NSE",
+                interval: str = "ONE_DAY", quotes: bool = False):
+    return screener.scan(client, symbols, conditions, exchange, interval, quotes)
+def screen(symbols: List[str], conditions: Any, exchange: str = "NSE",
+           interval: str = "ONE_DAY", quotes: bool = False):
+    out: Dict[str, Any] = {"matches": [], "errors": []}
+    for row in screen_iter(symbols, conditions, exchange, interval, quotes):
+        if row.get("done"):
+            out.update(scanned=row["scanned"], matched=row["matched"], failed=row["failed"])
+        elif "error" in row:
+            out["errors"].append(row)
+        else:
+            out["matches"].append(row)
+    return out
 def list_orders():
     return paper_engine.list_orders()
 def list_positions():
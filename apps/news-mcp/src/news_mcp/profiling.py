@@ -0,0 +1,122 @@
+import os
+import hmac
+import time
+import uuid
+import random
+import contextlib
+import functools
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+# On-demand request profiling. When PROFILE_DIR is set, a request is profiled
+# if it carries "X-Profile: <PROFILE_TOKEN>" or "?profile=<PROFILE_TOKEN>"
+# (opt-in is off while PROFILE_TOKEN is unset), or falls in the
+# PROFILE_SAMPLE_RATE fraction of traffic. Only the newest PROFILE_MAX_FILES
+# profiles are kept. Stage spans opened with span() /
+# @profiled are timed and written as folded stacks ("route;stage;sub <us>"),
+# one file per request, ready for flamegraph.pl or speedscope.
+#
+# Outside a profiled request span() returns a shared null context, so the
+# instrumented code pays one ContextVar lookup per stage.
+
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+TOKEN = os.getenv("PROFILE_TOKEN", "").encode()
+MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 500))
+
+_current: ContextVar[Optional["_Profile"]] = ContextVar("profile", default=None)
+_NULL = contextlib.nullcontext()
+
+class _Profile:
+    def __init__(self, root: str) -> None:
+        self.stack: List[str] = [root]
+        self.child: List[float] = [0.0]  # time spent in children, per open frame
+        self.folded: Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        self.stack.append(name)
+        self.child.append(0.0)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            key = ";".join(self.stack)
+            self.folded[key] = self.folded.get(key, 0.0) + elapsed - self.child.pop()
+            self.stack.pop()
+            self.child[-1] += elapsed
+
+    def finish(self, total: float) -> str:
+        root = self.stack[0]
+        self.folded[root] = self.folded.get(root, 0.0) + total - self.child[0]
+        return "".join(f"{k} {max(int(v * 1e6), 0)}\n" for k, v in self.folded.items())
+
+def span(name: str):
+    p = _current.get()
+    return _NULL if p is None else p.span(name)
+
+def profiled(name: str) -> Callable:
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            p = _current.get()
+            if p is None:
+                return fn(*args, **kwargs)
+            with p.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def _wanted(scope: Dict[str, Any]) -> bool:
+    if TOKEN:
+        for k, v in scope.get("headers") or []:
+            if k == b"x-profile":
+                return hmac.compare_digest(v.strip(), TOKEN)
+        qs = scope.get("query_string") or b""
+        if b"profile" in qs:
+            given = parse_qs(qs.decode("latin-1")).get("profile", [""])[0]
+            if hmac.compare_digest(given.encode(), TOKEN):
+                return True
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+def _prune(out: Path) -> None:
+    files = sorted(out.glob("*.folded"))  # names start with a timestamp
+    for f in files[:max(len(files) - MAX_FILES, 0)]:
+        f.unlink(missing_ok=True)
+
+class ProfileMiddleware:
+    """Pure ASGI middleware; unprofiled requests go straight through."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not PROFILE_DIR or scope["type"] != "http" or not _wanted(scope):
+            return await self.app(scope, receive, send)
+
+        pid = uuid.uuid4().hex[:12]
+        route = f"{scope.get('method', '')} {scope.get('path', '')}".replace(";", "_").replace(" ", "_")
+        prof = _Profile(route)
+        token = _current.set(prof)
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).append((b"x-profile-id", pid.encode()))
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _current.reset(token)
+            try:
+                out = Path(PROFILE_DIR)
+                out.mkdir(parents=True, exist_ok=True)
+                name = f"{time.strftime('%Y%m%dT%H%M%S')}-{route.strip('_').replace('/', '_')}-{pid}.folded"
+                (out / name).write_text(prof.finish(time.perf_counter() - t0))
+                _prune(out)
+            except OSError as e:
+                print(f"[news-mcp] could not write profile {pid}: {e}", flush=True)
@@ -1,14 +1,22 @@
 from fastmcp import FastMCP
-from pydantic import BaseModel, HttpUrl, Field, ValidationError
-from typing import List, Optional
+from pydantic import BaseModel, HttpUrl, Field, ValidationError, TypeAdapter
+from typing import Iterator, List, Optional
 import feedparser
+import xml.etree.ElementTree as ET
 from dateutil import parser as dtparse
+from email.utils import parsedate_to_datetime
 from urllib.parse import urlparse, parse_qs, unquote, quote_plus
+from urllib.request import Request, urlopen
+from http.client import IncompleteRead
 from datetime import datetime, timedelta, timezone
 import time, argparse, traceback
 
+from . import shared_cache, store
+from .dedup import StoryClusterer
+from .profiling import ProfileMiddleware, profiled, span
+
 # ---- explicit HTTP app (stable) ----
-from fastapi import FastAPI, Body, HTTPException
+from fastapi import FastAPI, Body, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
@@ -17,12 +25,21 @@ http_app = FastAPI(title="news-mcp-http")
 http_app.add_middleware(
     CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]
 )
+# Per-request profiles go to PROFILE_DIR when a request carries PROFILE_TOKEN
+# or is sampled; nothing is profiled while PROFILE_DIR is unset
+http_app.add_middleware(ProfileMiddleware)
 
 # ---------- Contracts ----------
 class NewsSearchInput(BaseModel):
     query: str = Field(min_length=1)
     lookback: str = "14d"
     locale: str = "en-IN"
+    limit: int = Field(default=12, ge=1, le=100)
+
+class LocalSearchInput(BaseModel):
+    query: str = Field(min_length=1)
+    lookback: str = "90d"
+    limit: int = Field(default=12, ge=1, le=100)
 
 class Article(BaseModel):
     id: str
@@ -30,8 +47,15 @@ class Article(BaseModel):
     url: HttpUrl
     source: Optional[str] = None
     publishedAt: str  # ISO UTC
+    # Near-duplicate headlines folded into this one, counted over the items
+    # read for the query (up to _SCAN_FACTOR x limit), so a lower bound
+    sourceCount: int = 1
 
 # ---------- Helpers ----------
+_UA = "news-mcp/0.1"
+_FETCH_TIMEOUT = 15  # seconds
+_SCAN_FACTOR = 4  # items read past the limit, as a multiple of it, for the store and sourceCount
+
 def _ceid(locale: str) -> str:
     lc = (locale or "").lower()
     if lc.startswith("en-in"): return "IN:en"
@@ -47,45 +71,165 @@ def _canonical_url(link: str) -> str:
         pass
     return link
 
-_CACHE: dict[str, tuple[float, List[Article]]] = {}
+def _lookback_days(lookback: str, default: int) -> int:
+    return int(lookback.rstrip("d")) if lookback.endswith("d") else default
+
+_ARTICLES = TypeAdapter(List[Article])
+
+# Each entry keeps the models (for the MCP tool) and the JSON body serialized
+# once at insert time (for the HTTP route), so hits never re-encode.
+_CACHE: dict[str, tuple[float, List[Article], bytes]] = {}
 _TTL = 10 * 60  # seconds
 
-def _cache_get(key: str) -> Optional[List[Article]]:
-    t, v = _CACHE.get(key, (0.0, None))
-    return v if v and (time.time() - t) < _TTL else None
+@profiled("cache_get")
+def _cache_get(key: str) -> Optional[tuple[List[Article], bytes]]:
+    t, v, body = _CACHE.get(key, (0.0, None, b""))
+    if v and (time.time() - t) < _TTL:
+        return v, body
+    # Another worker may have fetched it already
+    hit = shared_cache.get_bytes(f"news:{key}")
+    if hit is None:
+        return None
+    body, expires_at = hit
+    v = _ARTICLES.validate_json(body)
+    # Age the local copy like the shared row, so it expires when that does
+    _CACHE[key] = (expires_at - _TTL, v, body)
+    return v, body
 
-def _cache_set(key: str, val: List[Article]) -> None:
-    _CACHE[key] = (time.time(), val)
+@profiled("cache_set")
+def _cache_set(key: str, val: List[Article]) -> bytes:
+    body = _ARTICLES.dump_json(val)
+    _CACHE[key] = (time.time(), val, body)
+    shared_cache.set_bytes(f"news:{key}", body, _TTL)
+    return body
 
 # ---------- Tool logic (shared) ----------
-@mcp.tool(name="news.search")
-def news_search(payload: NewsSearchInput) -> List[Article]:
-    days = int(payload.lookback.rstrip("d")) if payload.lookback.endswith("d") else 14
+@profiled("news.search")
+def _search(payload: NewsSearchInput) -> tuple[List[Article], bytes]:
+    """Return (articles, serialized JSON body) for a query, served from cache when fresh."""
+    days = _lookback_days(payload.lookback, 14)
     since = datetime.now(timezone.utc) - timedelta(days=days)
 
-    cache_key = f"{payload.query}|{days}|{payload.locale}"
+    cache_key = f"{payload.query}|{days}|{payload.locale}|{payload.limit}"
     hit = _cache_get(cache_key)
     if hit is not None:
         return hit
 
-    ceid = _ceid(payload.locale)
-    gl, hl = ceid.split(":")
-    q = quote_plus(payload.query.strip())
-    rss = f"https://news.google.com/rss/search?q={q}&hl={hl}&gl={gl}&ceid={ceid}"
+    out, valid = _fetch_articles(payload, since)
+    _remember(valid)
+    if not out:
+        # Upstream failed, timed out or had nothing: answer from the local store
+        # without caching, so the next call retries the feed.
+        local = _local_articles(payload.query, since, payload.limit)
+        return local, _ARTICLES.dump_json(local)
 
-    feed = feedparser.parse(rss)
+    return out, _cache_set(cache_key, out)
 
-    # Log and continue on parse issues instead of raising
+@profiled("store.add_articles")
+def _remember(articles: List[Article]) -> None:
+    try:
+        store.add_articles(a.model_dump(mode="json") for a in articles)
+    except Exception as e:
+        print(f"[news-mcp] store write failed: {e}", flush=True)
+
+@profiled("store.search")
+def _local_articles(query: str, since: datetime, limit: int) -> List[Article]:
+    try:
+        rows = store.search(query, since.isoformat(), limit)
+    except Exception as e:
+        print(f"[news-mcp] store read failed: {e}", flush=True)
+        return []
+    return [Article(**r) for r in rows]
+
+def _parse_pub(raw: str) -> Optional[datetime]:
+    # Fast path: RSS pubDate is RFC-822; dateutil only for anything else.
+    try:
+        dt = parsedate_to_datetime(raw)
+    except (TypeError, ValueError, IndexError):
+        try:
+            dt = dtparse.parse(raw)
+        except Exception:
+            return None
+    if not dt.tzinfo:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+def _iter_rss_stream(rss: str) -> Iterator[tuple[str, str, str, Optional[str]]]:
+    """Yield (title, link, pubDate, source) per <item> while the response is still being read."""
+    with urlopen(Request(rss, headers={"User-Agent": _UA}), timeout=_FETCH_TIMEOUT) as resp:
+        for _, el in ET.iterparse(resp, events=("end",)):
+            if el.tag != "item":
+                continue
+            yield (
+                el.findtext("title") or "",
+                el.findtext("link") or "",
+                el.findtext("pubDate") or "",
+                el.findtext("source"),
+            )
+            el.clear()
+
+def _iter_feedparser(rss: str) -> Iterator[tuple[str, str, str, Optional[str]]]:
+    # Lenient fallback for feeds that are not well-formed XML.
+    feed = feedparser.parse(rss)
     if getattr(feed, "bozo", False):
         print(f"[news-mcp] bozo_exception: {getattr(feed, 'bozo_exception', None)}", flush=True)
+    for it in feed.entries or []:
+        src = getattr(it, "source", None)
+        yield (
+            it.get("title") or "",
+            it.get("link") or "",
+            it.get("published") or it.get("updated") or "",
+            getattr(src, "title", None) if src is not None else None,
+        )
+
+def _iter_items(rss: str) -> Iterator[tuple[str, str, str, Optional[str]]]:
+    yielded = False
+    try:
+        for item in _iter_rss_stream(rss):
+            yielded = True
+            yield item
+    except ET.ParseError as e:
+        # Malformed XML: feedparser is lenient enough to recover most of it
+        print(f"[news-mcp] rss parse error: {e}", flush=True)
+        if not yielded:
+            yield from _iter_feedparser(rss)
+    except (OSError, IncompleteRead) as e:
+        # Network failure or timeout: no second, unbounded download through
+        # feedparser; _search answers from the local store instead
+        print(f"[news-mcp] rss fetch error: {e}", flush=True)
+
+# Self time of this span is feed download + XML parsing, which happen while
+# the item loop pulls from the stream.
+@profiled("fetch_articles")
+def _fetch_articles(payload: NewsSearchInput, since: datetime) -> tuple[List[Article], List[Article]]:
+    """Return (results, every valid article read); the second list feeds the store."""
+    ceid = _ceid(payload.locale)
+    gl, hl = ceid.split(":")
+    q = quote_plus(payload.query.strip())
+    rss = f"https://news.google.com/rss/search?q={q}&hl={hl}&gl={gl}&ceid={ceid}"
 
     seen = set()
+    clusters = StoryClusterer()
+    rep: dict[int, int] = {}  # cluster id -> index in out
     out: List[Article] = []
+    valid: List[Article] = []
 
-    for idx, it in enumerate(feed.entries or []):
+    # Items are handled as they stream in. Once the limit is filled the loop
+    # reads on only up to _SCAN_FACTOR x limit items, for the store and to
+    # count later syndicated copies of returned stories, so cost
+    # follows the number of results rather than the size of the feed.
+    for n, (title, link_raw, pub_raw, source) in enumerate(_iter_items(rss)):
+        if len(out) >= payload.limit and n >= _SCAN_FACTOR * payload.limit:
+            break
         try:
-            title = (it.get("title") or "").strip()
-            link_raw = (it.get("link") or "").strip()
+            # Date filter first: stale items are the common case and cost nothing else
+            with span("parse_pub"):
+                published = _parse_pub(pub_raw)
+            if published is None or published < since:
+                continue
+
+            title = title.strip()
+            link_raw = link_raw.strip()
             if not title or not link_raw:
                 continue
 
@@ -94,38 +238,32 @@ def news_search(payload: NewsSearchInput) -> List[Article]:
             if not (link.startswith("http://") or link.startswith("https://")):
                 continue
 
-            pub_raw = it.get("published") or it.get("updated") or ""
-            try:
-                published = dtparse.parse(pub_raw)
-                if not published.tzinfo:
-                    published = published.replace(tzinfo=timezone.utc)
-                published = published.astimezone(timezone.utc)
-            except Exception:
-                # If we cannot parse a date, skip the item (keeps API stable)
-                continue
-
-            if published < since:
-                continue
-
-            source = None
-            src = getattr(it, "source", None)
-            if src is not None and getattr(src, "title", None):
-                source = src.title
-
             key_item = f"{title}::{link}"
             if key_item in seen:
                 continue
             seen.add(key_item)
 
             # Build the pydantic model inside try: if it fails, just skip this item
-            art = Article(
-                id=key_item.encode("utf-8").hex()[:24],
-                title=title,
-                url=link,
-                source=source,
-                publishedAt=published.isoformat()
-            )
-            out.append(art)
+            source = (source or "").strip() or None
+            with span("build_article"):
+                art = Article(
+                    id=key_item.encode("utf-8").hex()[:24],
+                    title=title,
+                    url=link,
+                    source=source,
+                    publishedAt=published.isoformat()
+                )
+            valid.append(art)  # stored even if it is a copy or past the limit
+
+            # Syndicated copies of a story count towards its representative
+            # instead of using up the result budget
+            with span("cluster"):
+                cid, _ = clusters.add(title, source)
+            if cid in rep:
+                out[rep[cid]].sourceCount += 1
+            elif len(out) < payload.limit:
+                rep[cid] = len(out)
+                out.append(art)
 
         except ValidationError as ve:
             print(f"[news-mcp] skip invalid article: {ve}", flush=True)
@@ -134,34 +272,50 @@ def news_search(payload: NewsSearchInput) -> List[Article]:
             print(f"[news-mcp] item error: {e}\n{traceback.format_exc()}", flush=True)
             continue
 
-    out = out[:12]
-    _cache_set(cache_key, out)
-    return out
+    return out, valid
+
+@mcp.tool(name="news.search")
+def news_search(payload: NewsSearchInput) -> List[Article]:
+    articles, _ = _search(payload)
+    return articles
+
+def _local_search(payload: LocalSearchInput) -> List[Article]:
+    since = datetime.now(timezone.utc) - timedelta(days=_lookback_days(payload.lookback, 90))
+    return _local_articles(payload.query, since, payload.limit)
+
+@mcp.tool(name="news.local_search")
+def news_local_search(payload: LocalSearchInput) -> List[Article]:
+    return _local_search(payload)
 
 # ---------- HTTP routes (with strong shape) ----------
 @http_app.get("/health")
 def health():
     return {"ok": True, "ts": datetime.now(timezone.utc).isoformat()}
 
+# The body is already validated and serialized by _search, so the route skips
+# response_model re-validation and hands the cached bytes straight back.
 @http_app.post("/tools/news.search", response_model=List[Article])
 @http_app.post("/tools/news.search/", response_model=List[Article])
-async def http_news_search(payload: NewsSearchInput = Body(...)):
-    import json
+def http_news_search(payload: NewsSearchInput = Body(...)):
     try:
-        print(f"[news-mcp] news.search called with payload: {payload}", flush=True)
-        tool_result = await news_search.run({"payload": payload.model_dump()})
-        # Extract JSON string from first TextContent object
-        if not tool_result.content or len(tool_result.content) == 0:
-            return {"articles": []}
-        articles_json = tool_result.content[0].text
-        articles = json.loads(articles_json)
-        print(f"[news-mcp] news.search returning articles {articles}", flush=True)
-        print(f"[news-mcp] news.search returning length: {len(articles)} articles", flush=True)
-        return articles
+        articles, body = _search(payload)
+        print(f"[news-mcp] news.search q={payload.query!r} lookback={payload.lookback} -> {len(articles)} articles", flush=True)
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         print(f"[news-mcp] fatal error: {e}\n{traceback.format_exc()}", flush=True)
         raise HTTPException(status_code=500, detail=f"news.search failed: {e}")
 
+@http_app.post("/tools/news.local_search", response_model=List[Article])
+@http_app.post("/tools/news.local_search/", response_model=List[Article])
+def http_news_local_search(payload: LocalSearchInput = Body(...)):
+    try:
+        articles = _local_search(payload)
+        print(f"[news-mcp] news.local_search q={payload.query!r} lookback={payload.lookback} -> {len(articles)} articles", flush=True)
+        return Response(content=_ARTICLES.dump_json(articles), media_type="application/json")
+    except Exception as e:
+        print(f"[news-mcp] fatal error: {e}\n{traceback.format_exc()}", flush=True)
+        raise HTTPException(status_code=500, detail=f"news.local_search failed: {e}")
+
 # ---------- Entrypoint ----------
 def main():
     parser = argparse.ArgumentParser()
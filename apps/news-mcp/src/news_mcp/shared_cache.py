@@ -0,0 +1,56 @@
+import os, sqlite3, threading, time
+from typing import Optional
+
+# Optional cache tier shared by every uvicorn worker on the host, backed by a
+# single SQLite file in WAL mode. Disabled (gets miss, sets are no-ops)
+# unless SHARED_CACHE_PATH is set. Each write is one INSERT OR REPLACE, so
+# other processes only ever see whole values.
+
+PATH = os.getenv("SHARED_CACHE_PATH")
+_PRUNE_EVERY = 256
+
+_local = threading.local()
+_writes = 0
+
+def _db() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        _local.conn = conn
+    return conn
+
+def get_bytes(key: str) -> Optional[tuple[bytes, float]]:
+    """Return (value, expires_at epoch seconds) for a live entry, else None."""
+    if not PATH:
+        return None
+    try:
+        row = _db().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+    except sqlite3.Error as e:
+        print(f"[news-mcp] shared cache read failed: {e}", flush=True)
+        return None
+    return (row[0], row[1]) if row else None
+
+def set_bytes(key: str, value: bytes, ttl: float) -> None:
+    global _writes
+    if not PATH:
+        return
+    now = time.time()
+    try:
+        conn = _db()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache(key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl),
+        )
+        _writes += 1
+        if _writes % _PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+    except sqlite3.Error as e:
+        print(f"[news-mcp] shared cache write failed: {e}", flush=True)
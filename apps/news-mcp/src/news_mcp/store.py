@@ -0,0 +1,91 @@
+import os, re, sqlite3, threading, time
+from typing import Any, Dict, Iterable, List, Optional
+
+# Local on-disk article store: every article news.search sees is kept here,
+# keyed by canonical URL, with an FTS5 index over title/source and a
+# B-tree index on publishedAt for lookback windows.
+
+STORE_PATH = os.getenv("NEWS_STORE_PATH", "news_store.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url          TEXT PRIMARY KEY,
+    id           TEXT NOT NULL,
+    title        TEXT NOT NULL,
+    source       TEXT,
+    published_at TEXT NOT NULL,
+    seen_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_published ON articles(published_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, source, content='articles', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts(rowid, title, source) VALUES (new.rowid, new.title, new.source);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, source) VALUES ('delete', old.rowid, old.title, old.source);
+END;
+"""
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_TICKER_SUFFIX = re.compile(r"\.(?:NS|BO|NSE|BSE)\b", re.IGNORECASE)  # RELIANCE.NS -> RELIANCE
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(STORE_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _conn = conn
+    return _conn
+
+def _match_expr(query: str) -> Optional[str]:
+    # Quote every term so user input can't inject FTS syntax. Terms are ORed
+    # and results ranked by bm25, so a headline need not contain every word
+    # of a search-engine style query.
+    terms = dict.fromkeys(t.lower() for t in _TOKEN.findall(_TICKER_SUFFIX.sub("", query or "")))
+    return " OR ".join(f'"{t}"' for t in terms) or None
+
+def add_articles(rows: Iterable[Dict[str, Any]]) -> int:
+    """Insert articles (dicts with id/title/url/source/publishedAt); known URLs are skipped."""
+    now = time.time()
+    params = [
+        (str(r["url"]), r["id"], r["title"], r.get("source"), r["publishedAt"], now)
+        for r in rows
+    ]
+    if not params:
+        return 0
+    with _lock:
+        conn = _db()
+        with conn:
+            cur = conn.executemany(
+                "INSERT INTO articles(url, id, title, source, published_at, seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(url) DO NOTHING",
+                params,
+            )
+        return cur.rowcount
+
+def search(query: str, since_iso: str, limit: int) -> List[Dict[str, Any]]:
+    """Articles matching any term of `query`, published at or after `since_iso`;
+    best bm25 match first, newest first among equals."""
+    match = _match_expr(query)
+    if match is None:
+        return []
+    with _lock:
+        cur = _db().execute(
+            "SELECT a.id, a.title, a.url, a.source, a.published_at "
+            "FROM articles_fts f JOIN articles a ON a.rowid = f.rowid "
+            "WHERE articles_fts MATCH ? AND a.published_at >= ? "
+            "ORDER BY bm25(articles_fts), a.published_at DESC LIMIT ?",
+            (match, since_iso, int(limit)),
+        )
+        rows = cur.fetchall()
+    return [
+        {"id": i, "title": t, "url": u, "source": s, "publishedAt": p}
+        for i, t, u, s, p in rows
+    ]